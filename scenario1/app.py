@@ -4,15 +4,32 @@ Author: Branden Reddy
 """
 
 import streamlit as st
-import json
 import os
 
+# Imported once at module load - Streamlit only re-executes this script,
+# not the import machinery, on reruns, so keeping these inside the button
+# handlers just re-paid the import lookup on every click.
+try:
+    from review_responder import format_confidence, generate_review_response_stream
+    from review_responder_with_rag import (
+        generate_review_response_with_rag,
+        retrieve_relevant_faqs_keyword
+    )
+    from security_and_evaluation import scan_for_injection, apply_outgoing_guardrails
+    _IMPORT_ERR = None
+except Exception as e:  # surface any import-time failure, not just missing modules
+    _IMPORT_ERR = str(e)
+
 st.set_page_config(
     page_title="Review Response Generator",
     page_icon="💬",
     layout="wide"
 )
 
+if _IMPORT_ERR:
+    st.error(f"Failed to import scenario modules: {_IMPORT_ERR}")
+    st.stop()
+
 st.title("Social Places - Review Response Generator")
 st.markdown("Scenario 1: Automated Review Response System")
 
@@ -69,46 +86,47 @@ with tab1:
 
         if generate_btn and api_key:
             try:
-                from review_responder import generate_review_response
-
-                with st.spinner("Generating response..."):
-                    result = generate_review_response(
-                        reviewer_name=reviewer_name,
-                        rating=rating,
-                        review_comment=review_comment
-                    )
+                # Stream the response so the reply paints while the model
+                # is still generating instead of blocking for the full call.
+                st.markdown("**Generated Response**")
+                response_placeholder = st.empty()
+                streamed = {}
+                result = None
+
+                for kind, payload in generate_review_response_stream(
+                    reviewer_name=reviewer_name,
+                    rating=rating,
+                    review_comment=review_comment
+                ):
+                    if kind == "field":
+                        field, text = payload
+                        streamed[field] = text
+                        response_placeholder.markdown("\n\n".join(
+                            streamed[p]
+                            for p in ["salutation", "introduction", "body", "conclusion", "closing"]
+                            if p in streamed
+                        ))
+                    else:
+                        result = payload
 
                 # Sentiment Analysis
+                st.markdown("---")
                 st.markdown("**Sentiment Analysis**")
                 sentiment = result["sentiment_analysis"]["sentiment"].upper()
                 confidence = result["sentiment_analysis"]["confidence"]
 
                 if sentiment == "POSITIVE":
-                    st.success(f"{sentiment} ({confidence:.0%} confidence)")
+                    st.success(f"{sentiment} ({format_confidence(confidence)} confidence)")
                 elif sentiment == "NEGATIVE":
-                    st.error(f"{sentiment} ({confidence:.0%} confidence)")
+                    st.error(f"{sentiment} ({format_confidence(confidence)} confidence)")
                 else:
-                    st.warning(f"{sentiment} ({confidence:.0%} confidence)")
+                    st.warning(f"{sentiment} ({format_confidence(confidence)} confidence)")
 
                 st.info(f"Reasoning: {result['sentiment_analysis']['reasoning']}")
                 st.markdown(f"**Detected Tone:** {result['detected_tone_context']}")
 
-                # Generated Response
-                st.markdown("---")
-                st.markdown("**Generated Response**")
-                response = result["response"]
-                full_response = f"""{response['salutation']}
-
-{response['introduction']}
-
-{response['body']}
-
-{response['conclusion']}
-
-{response['closing']}"""
-                st.text_area("Response", value=full_response, height=200, disabled=True)
-
                 # Support Link
+                st.markdown("---")
                 if result["support_link_included"]:
                     st.markdown(f"**Support Link:** {result['support_link']}")
 
@@ -138,11 +156,6 @@ with tab2:
     if st.button("Test RAG", type="primary"):
         if api_key:
             try:
-                from review_responder_with_rag import (
-                    generate_review_response_with_rag,
-                    retrieve_relevant_faqs_keyword
-                )
-
                 # Show retrieved FAQs
                 st.subheader("Retrieved FAQs")
                 faqs = retrieve_relevant_faqs_keyword(rag_review)
@@ -185,8 +198,6 @@ with tab3:
     )
 
     if st.button("Scan for Injection", type="primary"):
-        from security_and_evaluation import scan_for_injection
-
         result = scan_for_injection(security_test)
 
         if result.is_safe:
@@ -219,8 +230,6 @@ with tab4:
     )
 
     if st.button("Apply Filter", type="primary"):
-        from security_and_evaluation import apply_outgoing_guardrails
-
         result = apply_outgoing_guardrails(guardrail_test)
 
         if result.passed:
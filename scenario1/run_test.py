@@ -2,9 +2,11 @@
 Test runner for basic review responses.
 Author: Branden Reddy
 """
+import asyncio
 import os
 import sys
-import json
+
+import orjson
 
 os.environ["OPENAI_API_KEY"] = sys.argv[1] if len(sys.argv) > 1 else os.getenv("OPENAI_API_KEY", "")
 
@@ -12,29 +14,46 @@ if not os.environ.get("OPENAI_API_KEY"):
     print("Usage: python run_test.py YOUR_API_KEY")
     sys.exit(1)
 
-from review_responder import EXAMPLE_REVIEWS, generate_review_response, format_response_for_display
+from review_responder import EXAMPLE_REVIEWS, agenerate_review_response, format_response_for_display
 
 print("\nSOCIAL PLACES - REVIEW RESPONSE TEST")
 print("=" * 50)
 
-for i, review in enumerate(EXAMPLE_REVIEWS, 1):
+
+async def run_all():
+    # Reviews are independent, so fire them all concurrently; the
+    # semaphore caps in-flight requests to stay under the rate limit.
+    semaphore = asyncio.Semaphore(8)
+
+    async def generate(review):
+        async with semaphore:
+            try:
+                return await agenerate_review_response(
+                    reviewer_name=review["reviewer_name"],
+                    rating=review["rating"],
+                    review_comment=review["review_comment"]
+                )
+            except Exception as e:
+                return e
+
+    return await asyncio.gather(*[generate(review) for review in EXAMPLE_REVIEWS])
+
+
+results = asyncio.run(run_all())
+
+for i, (review, result) in enumerate(zip(EXAMPLE_REVIEWS, results), 1):
     print(f"\nREVIEW {i}:")
     print(f"  Reviewer: {review['reviewer_name']}")
     print(f"  Rating: {review['rating']}/5")
     print(f"  Comment: {review['review_comment']}")
 
-    try:
-        result = generate_review_response(
-            reviewer_name=review["reviewer_name"],
-            rating=review["rating"],
-            review_comment=review["review_comment"]
-        )
-        print(format_response_for_display(result))
+    if isinstance(result, Exception):
+        print(f"Error: {result}")
+        continue
 
-        with open(f"result_review_{i}.json", "w") as f:
-            json.dump(result, f, indent=2)
+    print(format_response_for_display(result))
 
-    except Exception as e:
-        print(f"Error: {e}")
+    with open(f"result_review_{i}.json", "wb") as f:
+        f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2))
 
 print("\nResults saved to JSON files.")
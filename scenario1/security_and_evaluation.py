@@ -11,38 +11,66 @@ detecting prompt injection attempts.
 import re
 from dataclasses import dataclass
 
+# RE2 compiles to a DFA with a linear-time guarantee, so adversarial
+# review text can't trigger catastrophic backtracking in the scanner.
+# The google-re2 bindings are a drop-in for the subset of re used here;
+# stdlib re remains the fallback where the wheel isn't available.
+try:
+    import re2 as _re_engine
+except ImportError:
+    _re_engine = re
+
 
 # PROMPT INJECTION DETECTION
-# These patterns catch common attempts to manipulate the AI
+# These patterns catch common attempts to manipulate the AI.
 
-INJECTION_PATTERNS = [
+_INJECTION_PATTERN_SPECS = [
     # Trying to override instructions
-    (r"ignore\s+(all\s+)?(previous|above|prior)\s+(instructions?|prompts?)", "instruction_override"),
-    (r"disregard\s+(all\s+)?(previous|above|prior)", "instruction_override"),
-    (r"forget\s+(everything|all|what)\s+(you|i)\s+(said|told|know)", "instruction_override"),
+    (r"ignore\s+(?:all\s+)?(?:previous|above|prior)\s+(?:instructions?|prompts?)", "instruction_override"),
+    (r"disregard\s+(?:all\s+)?(?:previous|above|prior)", "instruction_override"),
+    (r"forget\s+(?:everything|all|what)\s+(?:you|i)\s+(?:said|told|know)", "instruction_override"),
 
     # Trying to change the AI's role
-    (r"you\s+are\s+now\s+(a|an|in)\s+", "role_manipulation"),
-    (r"pretend\s+(to\s+be|you're|you\s+are)", "role_manipulation"),
-    (r"act\s+as\s+(if|though|a)", "role_manipulation"),
+    (r"you\s+are\s+now\s+(?:a|an|in)\s+", "role_manipulation"),
+    (r"pretend\s+(?:to\s+be|you're|you\s+are)", "role_manipulation"),
+    (r"act\s+as\s+(?:if|though|a)", "role_manipulation"),
     (r"switch\s+to\s+\w+\s+mode", "role_manipulation"),
 
     # Trying to extract the system prompt
-    (r"(show|reveal|display|print|output)\s+(your|the|system)\s+(prompt|instructions)", "prompt_extraction"),
-    (r"what\s+(are|is)\s+your\s+(system\s+)?(prompt|instructions)", "prompt_extraction"),
-    (r"repeat\s+(your|the)\s+(system\s+)?(prompt|instructions)", "prompt_extraction"),
+    (r"(?:show|reveal|display|print|output)\s+(?:your|the|system)\s+(?:prompt|instructions)", "prompt_extraction"),
+    (r"what\s+(?:are|is)\s+your\s+(?:system\s+)?(?:prompt|instructions)", "prompt_extraction"),
+    (r"repeat\s+(?:your|the)\s+(?:system\s+)?(?:prompt|instructions)", "prompt_extraction"),
 
     # Hidden commands in brackets
-    (r"\[\[.*?(admin|system|override|ignore).*?\]\]", "hidden_instruction"),
-    (r"\{\{.*?(admin|system|override|ignore).*?\}\}", "hidden_instruction"),
-    (r"<\s*(system|admin|override).*?>", "hidden_instruction"),
+    (r"\[\[.*?(?:admin|system|override|ignore).*?\]\]", "hidden_instruction"),
+    (r"\{\{.*?(?:admin|system|override|ignore).*?\}\}", "hidden_instruction"),
+    (r"<\s*(?:system|admin|override).*?>", "hidden_instruction"),
 
     # Known jailbreak patterns
-    (r"(DAN|STAN|DUDE)\s*mode", "jailbreak"),
-    (r"bypass\s+(safety|filter|restriction)", "jailbreak"),
-    (r"unlock\s+(developer|admin|hidden)\s+mode", "jailbreak"),
+    (r"(?:DAN|STAN|DUDE)\s*mode", "jailbreak"),
+    (r"bypass\s+(?:safety|filter|restriction)", "jailbreak"),
+    (r"unlock\s+(?:developer|admin|hidden)\s+mode", "jailbreak"),
+]
+
+# Kept for callers that want the individual patterns.
+INJECTION_PATTERNS = [
+    (_re_engine.compile(pattern, _re_engine.IGNORECASE), tag)
+    for pattern, tag in _INJECTION_PATTERN_SPECS
 ]
 
+# All patterns unioned into one alternation, each wrapped in a named group
+# ("{tag}_{index}"), so one pass over the input replaces 16 separate scans.
+_INJECTION_RE = _re_engine.compile(
+    "|".join(
+        f"(?P<{tag}_{i}>{pattern})"
+        for i, (pattern, tag) in enumerate(_INJECTION_PATTERN_SPECS)
+    ),
+    _re_engine.IGNORECASE
+)
+
+
+_RISK_LEVELS = ("none", "low", "medium", "high")
+
 
 @dataclass
 class SecurityScanResult:
@@ -59,22 +87,24 @@ def scan_for_injection(text):
     Returns a result with risk level and what was detected.
     """
     detected = []
-    sanitized = text
-
-    for pattern, pattern_type in INJECTION_PATTERNS:
-        matches = re.findall(pattern, text.lower())
-        if matches:
-            detected.append(f"{pattern_type}: matched '{pattern}'")
-            sanitized = re.sub(pattern, "[FILTERED]", sanitized, flags=re.IGNORECASE)
-
-    if not detected:
-        risk_level = "none"
-    elif len(detected) == 1:
-        risk_level = "low"
-    elif len(detected) <= 3:
-        risk_level = "medium"
-    else:
-        risk_level = "high"
+    seen = set()
+
+    # One pass over the input; the named group that matched tells us which
+    # pattern fired. One entry per distinct pattern, as before.
+    for match in _INJECTION_RE.finditer(text):
+        group = match.lastgroup
+        if group in seen:
+            continue
+        seen.add(group)
+        pattern, pattern_type = _INJECTION_PATTERN_SPECS[int(group.rsplit("_", 1)[1])]
+        detected.append(f"{pattern_type}: matched '{pattern}'")
+
+    sanitized = _INJECTION_RE.sub("[FILTERED]", text) if detected else text
+
+    # Branchless equivalent of the none/1/<=3/more cascade: each threshold
+    # comparison contributes 0 or 1 to the index into _RISK_LEVELS.
+    n = len(detected)
+    risk_level = _RISK_LEVELS[(n > 0) + (n > 1) + (n > 3)]
 
     recommendations = []
     if detected:
@@ -153,14 +183,27 @@ BLOCKED_TERMS = {
     "sweetie": "valued customer",
 }
 
+# All blocked terms in one alternation (longest-first so multi-word terms
+# like "awesome sauce" win over any shorter overlap): one pass over the
+# response replaces ~25 search+sub scans, with a callback looking up each
+# term's replacement.
+_TERM_RE = _re_engine.compile(
+    r"\b(" + "|".join(
+        re.escape(term) for term in sorted(BLOCKED_TERMS, key=len, reverse=True)
+    ) + r")\b",
+    _re_engine.IGNORECASE
+)
+
 BLOCKED_PATTERNS = [
-    (r"\b(lol|lmao|rofl|omg)\b", ""),
-    (r"!!+", "!"),
-    (r"\?\?+", "?"),
-    (r"\.\.\.+", "..."),
-    (r"\b(tbh|imo|imho|fyi|btw)\b", ""),
+    (_re_engine.compile(r"\b(lol|lmao|rofl|omg)\b", _re_engine.IGNORECASE), ""),
+    (_re_engine.compile(r"!!+"), "!"),
+    (_re_engine.compile(r"\?\?+"), "?"),
+    (_re_engine.compile(r"\.\.\.+"), "..."),
+    (_re_engine.compile(r"\b(tbh|imo|imho|fyi|btw)\b", _re_engine.IGNORECASE), ""),
 ]
 
+_WHITESPACE_RE = _re_engine.compile(r"\s+")
+
 
 @dataclass
 class GuardrailResult:
@@ -176,26 +219,28 @@ def apply_outgoing_guardrails(text):
     Filter the AI response for inappropriate or off-brand language.
     Returns what was changed so it can be logged for improvement.
     """
-    filtered = text
     terms_replaced = []
     patterns_matched = []
+    _seen_terms = set()
+
+    def _replace_term(match):
+        term = match.group(1).lower()
+        replacement = BLOCKED_TERMS[term]
+        if term not in _seen_terms:
+            _seen_terms.add(term)
+            terms_replaced.append((term, replacement if replacement else "[removed]"))
+        return replacement
 
-    for term, replacement in BLOCKED_TERMS.items():
-        pattern = re.compile(re.escape(term), re.IGNORECASE)
-        if pattern.search(filtered):
-            if replacement:
-                filtered = pattern.sub(replacement, filtered)
-                terms_replaced.append((term, replacement))
-            else:
-                filtered = pattern.sub("", filtered)
-                terms_replaced.append((term, "[removed]"))
+    filtered = _TERM_RE.sub(_replace_term, text)
 
+    # subn substitutes and counts in one scan - no separate search pass
+    # just to find out whether the pattern occurs.
     for pattern, replacement in BLOCKED_PATTERNS:
-        if re.search(pattern, filtered, re.IGNORECASE):
-            filtered = re.sub(pattern, replacement, filtered, flags=re.IGNORECASE)
-            patterns_matched.append(pattern)
+        filtered, n = pattern.subn(replacement, filtered)
+        if n:
+            patterns_matched.append(pattern.pattern)
 
-    filtered = re.sub(r'\s+', ' ', filtered).strip()
+    filtered = _WHITESPACE_RE.sub(' ', filtered).strip()
 
     return GuardrailResult(
         passed=len(terms_replaced) == 0 and len(patterns_matched) == 0,
@@ -208,6 +253,13 @@ def apply_outgoing_guardrails(text):
 
 # EVALUATION METRICS
 
+# Hoisted so the scoring hot path doesn't rebuild the set per call.
+_STOP_WORDS = frozenset({
+    "the", "a", "an", "is", "was", "were", "be", "been",
+    "and", "or", "but", "i", "we", "you", "it",
+})
+
+
 @dataclass
 class ResponseEvaluation:
     response_length: int
@@ -245,8 +297,7 @@ def evaluate_response(response, original_review, expected_sentiment=None):
 
     review_words = set(original_review.lower().split())
     response_words = set(full_response.lower().split())
-    stop_words = {"the", "a", "an", "is", "was", "were", "be", "been", "and", "or", "but", "i", "we", "you", "it"}
-    common_words = review_words.intersection(response_words) - stop_words
+    common_words = (review_words & response_words) - _STOP_WORDS
     relevance_score = min(len(common_words) / 5, 1.0)
 
     professionalism_score = 1.0 if guardrail_result.passed else 0.5
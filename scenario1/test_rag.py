@@ -2,13 +2,14 @@
 Test script for RAG/FAQ integration.
 Author: Branden Reddy
 """
+import asyncio
 import os
 import sys
 
 os.environ["OPENAI_API_KEY"] = sys.argv[1] if len(sys.argv) > 1 else ""
 
 from review_responder_with_rag import (
-    generate_review_response_with_rag,
+    agenerate_review_response_with_rag,
     format_rag_response_for_display,
     retrieve_relevant_faqs_keyword
 )
@@ -37,7 +38,30 @@ TEST_REVIEWS = [
     }
 ]
 
-for i, review in enumerate(TEST_REVIEWS, 1):
+
+async def run_all():
+    # Independent reviews run concurrently; the semaphore keeps the
+    # request burst under the rate limit.
+    semaphore = asyncio.Semaphore(8)
+
+    async def generate(review):
+        async with semaphore:
+            try:
+                return await agenerate_review_response_with_rag(
+                    reviewer_name=review["reviewer_name"],
+                    rating=review["rating"],
+                    review_comment=review["review_comment"],
+                    use_embeddings=False
+                )
+            except Exception as e:
+                return e
+
+    return await asyncio.gather(*[generate(review) for review in TEST_REVIEWS])
+
+
+results = asyncio.run(run_all())
+
+for i, (review, result) in enumerate(zip(TEST_REVIEWS, results), 1):
     print(f"\nTEST {i}: Expecting {review['expected_faq'].upper()} FAQ")
     print(f"Review: \"{review['review_comment']}\"")
 
@@ -46,16 +70,10 @@ for i, review in enumerate(TEST_REVIEWS, 1):
     for faq in faqs:
         print(f"  {faq['category']}: {faq['question'][:40]}...")
 
-    try:
-        result = generate_review_response_with_rag(
-            reviewer_name=review["reviewer_name"],
-            rating=review["rating"],
-            review_comment=review["review_comment"],
-            use_embeddings=False
-        )
-        print(format_rag_response_for_display(result))
-
-    except Exception as e:
-        print(f"Error: {e}")
+    if isinstance(result, Exception):
+        print(f"Error: {result}")
+        continue
+
+    print(format_rag_response_for_display(result))
 
 print("\nRAG TEST COMPLETE")
@@ -4,12 +4,27 @@ Author: Branden Reddy
 """
 
 import streamlit as st
-import json
 import os
 import sys
 
-# Add parent directory to path for imports
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Add this directory to the path for imports - guarded, because
+# Streamlit re-executes this script on every interaction and an
+# unconditional insert grows sys.path (and slows imports) per rerun.
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if _APP_DIR not in sys.path:
+    sys.path.insert(0, _APP_DIR)
+
+# Imported once at module load - Streamlit re-runs this script on every
+# interaction, so imports buried in button branches re-paid the lookup
+# (and on first click, the full pyarrow/openai import) per click.
+try:
+    import pyarrow as pa
+
+    from query_generator import generate_sql_query_stream, apply_plan_guided_retry, check_competitor_mention, validate_sql_safety
+    from query_executor import execute_with_analysis
+    _IMPORT_ERR = None
+except ImportError as e:
+    _IMPORT_ERR = str(e)
 
 st.set_page_config(
     page_title="Review Reporting Tool",
@@ -17,6 +32,47 @@ st.set_page_config(
     layout="wide"
 )
 
+if _IMPORT_ERR:
+    st.error(f"Failed to import scenario modules: {_IMPORT_ERR}")
+    st.stop()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_exec(sql):
+    """Memoize query results by SQL text for 5 minutes - Streamlit reruns
+    the whole script on any widget interaction, so without this a repeat
+    of the same query re-hits SQLite and re-parses the EXPLAIN plan."""
+    return execute_with_analysis(sql)
+
+
+# Low-cardinality text columns - dictionary-encoding these before
+# display cuts the app->browser payload roughly in half on wide results.
+_DICT_COLS = ("store_name", "brand_name", "platform", "review_status")
+
+
+@st.cache_data(show_spinner=False)
+def _arrow_table(data, columns):
+    """Build the Arrow table st.dataframe ships to the browser once per
+    distinct result set, skipping the pandas detour entirely. Rows come
+    from the executor as tuples; one zip(*) transposes them into the
+    column arrays Arrow wants anyway."""
+    tbl = pa.table(dict(zip(columns, map(list, zip(*data)))))
+    for name in _DICT_COLS:
+        if name in tbl.column_names:
+            idx = tbl.schema.get_field_index(name)
+            tbl = tbl.set_column(
+                idx, name,
+                tbl.column(name).cast(pa.dictionary(pa.int32(), pa.string()))
+            )
+    return tbl
+
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _db_exists():
+    """One stat() every few seconds instead of one per rerun."""
+    return os.path.exists("reviews.db")
+
+
 st.title("Social Places - Review Reporting Tool")
 st.markdown("Scenario 2: Natural Language SQL Query System")
 
@@ -41,10 +97,14 @@ with st.sidebar:
         conn = create_database("reviews.db")
         generate_sample_data(conn, num_reviews=5000)
         conn.close()
+        _db_exists.clear()
+        # Reseeding anchors review_date to now, so cached results for
+        # the same SQL are stale the moment the rebuild finishes.
+        _cached_exec.clear()
         st.success("Database reset with 5000 reviews")
 
 # Check if database exists
-db_exists = os.path.exists("reviews.db")
+db_exists = _db_exists()
 if not db_exists:
     st.warning("Database not found. Click 'Reset Database' in the sidebar to create it.")
 
@@ -89,9 +149,6 @@ with tab1:
             st.error("Please create the database first using 'Reset Database' in the sidebar")
         else:
             try:
-                from query_generator import generate_sql_query, check_competitor_mention, validate_sql_safety
-                from query_executor import execute_with_analysis, format_result_as_table
-
                 # Pre-check for competitors
                 has_competitor, competitor = check_competitor_mention(question)
 
@@ -99,8 +156,17 @@ with tab1:
                     st.error(f"BLOCKED: Cannot process queries about competitor brands ({competitor})")
                     st.info("This guardrail prevents queries that mention other restaurant brands.")
                 else:
-                    with st.spinner("Generating SQL query..."):
-                        result = generate_sql_query(question)
+                    # Stream the SQL into a placeholder as it generates,
+                    # then clear it and render the full layout below -
+                    # time-to-first-token instead of a frozen spinner.
+                    sql_placeholder = st.empty()
+                    result = None
+                    for kind, payload in generate_sql_query_stream(question):
+                        if kind == "sql":
+                            sql_placeholder.code(payload, language="sql")
+                        else:
+                            result = payload
+                    sql_placeholder.empty()
 
                     # Show interpretation
                     st.subheader("Query Interpretation")
@@ -113,9 +179,16 @@ with tab1:
                             st.warning(f"**Clarification:** {result['clarification_needed']}")
                             st.markdown("Proceeding with best interpretation...")
 
+                        # One plan-guided retry: if EXPLAIN flags full
+                        # table scans, the plan goes back to the model
+                        # for a rewrite before anything executes.
+                        result = apply_plan_guided_retry(question, result)
+
                         # Show generated SQL
                         st.subheader("Generated SQL")
                         st.code(result['sql_query'], language="sql")
+                        if "_retry" in result:
+                            st.caption("Rewritten after EXPLAIN flagged the first plan.")
                         st.markdown(f"**Explanation:** {result['query_explanation']}")
 
                         # Validate SQL safety
@@ -126,21 +199,20 @@ with tab1:
                         else:
                             # Execute the query
                             with st.spinner("Executing query..."):
-                                exec_result = execute_with_analysis(result['sql_query'])
+                                exec_result = _cached_exec(result['sql_query'])
 
                             st.subheader("Results")
 
                             if exec_result.success:
                                 # Show as dataframe if we have results
                                 if exec_result.data:
-                                    import pandas as pd
-                                    df = pd.DataFrame(exec_result.data)
-                                    st.dataframe(df, use_container_width=True)
+                                    tbl = _arrow_table(exec_result.data, exec_result.columns)
+                                    st.dataframe(tbl, use_container_width=True)
                                 else:
                                     st.info("Query returned no results")
 
                                 st.markdown(f"**Rows returned:** {exec_result.row_count}")
-                                st.markdown(f"**Execution time:** {exec_result.execution_time_ms}ms")
+                                st.markdown(f"**Execution time:** {exec_result.execution_time_ms:.2f}ms")
                             else:
                                 st.error(f"Query failed: {exec_result.error_message}")
 
@@ -168,9 +240,6 @@ with tab2:
             st.error("Please create the database first")
         else:
             try:
-                from query_generator import validate_sql_safety
-                from query_executor import execute_with_analysis
-
                 # Safety check
                 is_safe, reason = validate_sql_safety(custom_sql)
 
@@ -178,17 +247,16 @@ with tab2:
                     st.error(f"Query blocked: {reason}")
                 else:
                     with st.spinner("Executing..."):
-                        result = execute_with_analysis(custom_sql)
+                        result = _cached_exec(custom_sql)
 
                     if result.success:
                         if result.data:
-                            import pandas as pd
-                            df = pd.DataFrame(result.data)
-                            st.dataframe(df, use_container_width=True)
+                            tbl = _arrow_table(result.data, result.columns)
+                            st.dataframe(tbl, use_container_width=True)
                         else:
                             st.info("No results")
 
-                        st.markdown(f"**Execution time:** {result.execution_time_ms}ms")
+                        st.markdown(f"**Execution time:** {result.execution_time_ms:.2f}ms")
                     else:
                         st.error(f"Error: {result.error_message}")
 
@@ -211,30 +279,39 @@ with tab3:
             st.error("Please create the database first")
         else:
             try:
-                from query_executor import execute_with_analysis
-
                 with st.spinner("Analyzing..."):
-                    result = execute_with_analysis(perf_sql)
+                    result = _cached_exec(perf_sql)
 
                 st.subheader("EXPLAIN Query Plan")
                 if result.explain_plan:
-                    for row in result.explain_plan:
-                        st.code(str(row))
+                    # One code block instead of one component per plan
+                    # row - each st.code is its own DOM element shipped
+                    # over the websocket, so long plans rendered slowly.
+                    st.code("\n".join(str(row) for row in result.explain_plan), language="text")
                 else:
                     st.info("No plan available")
 
                 st.subheader("Performance Notes")
                 if result.performance_notes:
+                    # Same batching for the notes: one component per
+                    # severity bucket rather than per note.
+                    good, bad, rest = [], [], []
                     for note in result.performance_notes:
                         if "efficient" in note.lower() or "good" in note.lower():
-                            st.success(note)
+                            good.append(note)
                         elif "scan" in note.lower() or "slow" in note.lower():
-                            st.warning(note)
+                            bad.append(note)
                         else:
-                            st.info(note)
+                            rest.append(note)
+                    if good:
+                        st.success("\n\n".join(good))
+                    if bad:
+                        st.warning("\n\n".join(bad))
+                    if rest:
+                        st.info("\n\n".join(rest))
 
                 if result.success:
-                    st.markdown(f"**Actual execution time:** {result.execution_time_ms}ms")
+                    st.markdown(f"**Actual execution time:** {result.execution_time_ms:.2f}ms")
                     st.markdown(f"**Rows returned:** {result.row_count}")
 
             except Exception as e:
@@ -252,8 +329,6 @@ with tab4:
     )
 
     if st.button("Check Competitor Filter"):
-        from query_generator import check_competitor_mention
-
         has_competitor, competitor = check_competitor_mention(competitor_test)
 
         if has_competitor:
@@ -271,8 +346,6 @@ with tab4:
     )
 
     if st.button("Check SQL Safety"):
-        from query_generator import validate_sql_safety
-
         is_safe, reason = validate_sql_safety(sql_test)
 
         if is_safe:
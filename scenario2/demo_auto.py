@@ -8,6 +8,7 @@ Run this script to see all features in action without the web interface.
 Usage: python demo_auto.py YOUR_API_KEY
 """
 
+import asyncio
 import os
 import sys
 
@@ -20,8 +21,8 @@ else:
     if not os.environ.get("OPENAI_API_KEY"):
         sys.exit(1)
 
-from database_setup import create_database, generate_sample_data
-from query_generator import generate_sql_query, check_competitor_mention, validate_sql_safety, format_query_result
+from database_setup import ensure_database
+from query_generator import agenerate_sql_query, check_competitor_mention, validate_sql_safety, format_query_result
 from query_executor import execute_with_analysis, format_result_as_table, format_explain_output
 
 
@@ -31,6 +32,22 @@ def print_section(title):
     print("=" * 60)
 
 
+def generate_all(questions):
+    """Fire the independent demo questions concurrently - wall time is
+    ~one round trip instead of one per question. The semaphore keeps the
+    burst under the rate limit."""
+    semaphore = asyncio.Semaphore(8)
+
+    async def generate(question):
+        async with semaphore:
+            return await agenerate_sql_query(question)
+
+    async def gather_all():
+        return await asyncio.gather(*[generate(q) for q in questions])
+
+    return asyncio.run(gather_all())
+
+
 def main():
     print_section("SCENARIO 2: TEXT-TO-SQL REPORTING TOOL")
     print("Author: Branden Reddy")
@@ -38,18 +55,23 @@ def main():
 
     # Setup database
     print_section("1. DATABASE SETUP")
-    print("Creating SQLite database with sample review data...")
-    conn = create_database("reviews.db")
-    generate_sample_data(conn, num_reviews=5000)
-    conn.close()
+    if ensure_database("reviews.db", num_reviews=5000):
+        print("Created SQLite database with sample review data.")
+    else:
+        print("Existing database matches the seed fingerprint - skipping reseed.")
     print("Database ready with 5000 reviews across 10 Cape Town stores.")
 
+    # The three LLM-bound questions (the competitor one never reaches the
+    # model - it's blocked by the synchronous pre-filter) run concurrently.
+    question1 = "Which 5 stores have the lowest average rating?"
+    question2 = "Give me a breakdown of service sentiment across all stores"
+    question4 = "Show me reviews"
+    result1, result2, result4 = generate_all([question1, question2, question4])
+
     # Test Question 1: Bottom 5 stores
     print_section("2. TEST: Bottom 5 Stores by Rating")
-    question1 = "Which 5 stores have the lowest average rating?"
     print(f"Question: {question1}")
 
-    result1 = generate_sql_query(question1)
     print(f"\n{format_query_result(result1)}")
 
     if not result1['is_blocked'] and result1['sql_query']:
@@ -59,10 +81,8 @@ def main():
 
     # Test Question 2: Service breakdown
     print_section("3. TEST: Service Sentiment Breakdown")
-    question2 = "Give me a breakdown of service sentiment across all stores"
     print(f"Question: {question2}")
 
-    result2 = generate_sql_query(question2)
     print(f"\n{format_query_result(result2)}")
 
     if not result2['is_blocked'] and result2['sql_query']:
@@ -80,19 +100,18 @@ def main():
         print(f"\nBLOCKED by pre-filter: Competitor brand detected ({competitor})")
         print("The system does not process queries about competitor restaurants.")
     else:
-        result3 = generate_sql_query(question3)
+        result3 = generate_all([question3])[0]
         print(f"\n{format_query_result(result3)}")
 
     # Test Question 4: Ambiguous question
     print_section("5. TEST: Ambiguous Question Handling")
-    question4 = "Show me reviews"
     print(f"Question: {question4}")
 
-    result4 = generate_sql_query(question4)
     print(f"\n{format_query_result(result4)}")
 
     if not result4['is_blocked'] and result4['sql_query']:
-        exec_result = execute_with_analysis(result4['sql_query'])
+        # Only 5 rows get displayed, so only 6 get fetched.
+        exec_result = execute_with_analysis(result4['sql_query'], fetch_limit=5)
         print(f"\nRESULTS (limited):")
         print(format_result_as_table(exec_result, max_rows=5))
 
@@ -125,7 +144,7 @@ def main():
 
     exec_result = execute_with_analysis(test_sql)
     print(format_explain_output(exec_result))
-    print(f"\nActual execution: {exec_result.execution_time_ms}ms for {exec_result.row_count} rows")
+    print(f"\nActual execution: {exec_result.execution_time_ms:.2f}ms for {exec_result.row_count} rows")
 
     # Summary
     print_section("DEMO COMPLETE")
@@ -5,10 +5,70 @@ Author: Branden Reddy
 """
 
 import os
-import json
 import re
-from openai import OpenAI
-
+from functools import lru_cache
+
+import httpx
+import orjson
+from openai import AsyncOpenAI, OpenAI
+from pydantic import BaseModel
+
+from query_executor import get_explain_plan
+
+try:
+    import sqlglot
+    from sqlglot.optimizer.pushdown_predicates import pushdown_predicates
+except ImportError:  # optional - the pushdown rewrite is skipped without it
+    sqlglot = None
+
+
+@lru_cache(maxsize=1)
+def _get_client():
+    """Process-wide sync client, created on first use (lazily, so
+    importing this module doesn't require an API key - the Streamlit app
+    sets it after import). A fresh OpenAI() per call paid a new TCP+TLS
+    handshake each time; the pooled HTTP/2 client keeps connections warm
+    and multiplexes concurrent requests over one of them."""
+    return OpenAI(http_client=httpx.Client(
+        http2=True,
+        timeout=120.0,
+        limits=httpx.Limits(max_keepalive_connections=20)
+    ))
+
+
+@lru_cache(maxsize=1)
+def _get_async_client():
+    """Async counterpart of _get_client, shared by concurrent callers."""
+    return AsyncOpenAI(http_client=httpx.AsyncClient(
+        http2=True,
+        timeout=120.0,
+        limits=httpx.Limits(max_keepalive_connections=20)
+    ))
+
+
+class SQLQueryResponse(BaseModel):
+    """Typed response model for the parse API - the SDK validates the
+    model's JSON against this before we ever see it, so there is no
+    json.loads pass or malformed-JSON fallback on the blocking paths."""
+    understood_question: str
+    is_ambiguous: bool
+    clarification_needed: str
+    sql_query: str
+    query_explanation: str
+    expected_columns: list[str]
+    is_blocked: bool
+    block_reason: str
+
+
+class SQLQueryBatchResponse(BaseModel):
+    """Array wrapper for batched questions - Structured Outputs requires
+    an object at the root, so the per-question objects ride in a list."""
+    responses: list[SQLQueryResponse]
+
+
+# Hand-written schema kept for the streaming path only - the parse API
+# used by the blocking calls does not stream, and stream chunks arrive
+# as raw text regardless.
 SQL_RESPONSE_SCHEMA = {
     "type": "json_schema",
     "json_schema": {
@@ -164,76 +224,344 @@ SQL: SELECT store_name, AVG(rating) as avg_rating, COUNT(*) as review_count
 """
 
 
-def generate_sql_query(question: str) -> dict:
-    client = OpenAI()
+# The schema rides in the system message rather than being re-embedded
+# in every user message: all requests then share a byte-identical prefix
+# (system prompt + schema), which is what OpenAI's automatic prompt
+# cache keys on - repeat calls bill cached prompt tokens and start
+# generating sooner. The user message carries only the question.
+_SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT + "\n" + DATABASE_SCHEMA}
 
-    user_message = f"""
-{DATABASE_SCHEMA}
 
+def _build_user_message(question: str) -> str:
+    return f"""
 USER QUESTION: {question}
 
 Generate a SQL query to answer this question. Follow all rules and guardrails.
 """
 
-    response = client.chat.completions.create(
+
+def _build_batch_message(questions: list) -> str:
+    numbered = "\n".join(f"QUESTION {i}: {q}" for i, q in enumerate(questions, start=1))
+    return f"""
+USER QUESTIONS:
+{numbered}
+
+Generate a SQL query for each question, one response object per question,
+in the same order. Follow all rules and guardrails for each.
+"""
+
+
+_SELECT_STAR_RE = re.compile(r"^\s*SELECT\s+\*\s+", re.IGNORECASE)
+
+
+def rewrite_for_covering_index(sql: str, expected_columns: list, db_path: str = "reviews.db") -> str:
+    """Project a top-level SELECT * down to the columns the model said it
+    needs, when that lets SQLite serve the query from a covering index.
+
+    The rewrite is only committed after an EXPLAIN QUERY PLAN of the
+    projected SQL confirms both that it still parses (expected_columns
+    can contain aliases that don't exist) and that the planner actually
+    picks a covering index - otherwise the original SQL is returned
+    untouched.
+    """
+    if not expected_columns or not _SELECT_STAR_RE.match(sql):
+        return sql
+
+    projected = _SELECT_STAR_RE.sub(
+        "SELECT " + ", ".join(expected_columns) + " ", sql, count=1
+    )
+
+    plan, _ = get_explain_plan(projected, db_path)
+    if plan and any("COVERING INDEX" in str(row).upper() for row in plan):
+        return projected
+    return sql
+
+
+def pushdown_outer_predicates(sql: str, db_path: str = "reviews.db") -> str:
+    """Push outer WHERE predicates into subqueries before SQLite sees
+    the query.
+
+    LLM-generated SQL likes to wrap an aggregation and filter it from
+    the outside; SQLite's planner flattens many of those shapes itself
+    but not all (materialized CTEs, window-function subqueries), and the
+    unflattened ones materialize the full inner result first. sqlglot's
+    pushdown optimizer handles the rewrite; it is an optional dependency,
+    and any parse failure or a rewrite that no longer EXPLAINs cleanly
+    falls back to the original SQL.
+    """
+    if sqlglot is None:
+        return sql
+
+    try:
+        tree = sqlglot.parse_one(sql, read="sqlite")
+        rewritten = pushdown_predicates(tree).sql(dialect="sqlite")
+    except Exception:
+        return sql
+
+    if rewritten == sql:
+        return sql
+
+    plan, _ = get_explain_plan(rewritten, db_path)
+    return rewritten if plan else sql
+
+
+def _optimize_generated_sql(result: dict) -> dict:
+    """Post-generation rewrite pass shared by all generator entry points."""
+    sql = result["sql_query"]
+    if sql:
+        sql = rewrite_for_covering_index(sql, result["expected_columns"])
+        sql = pushdown_outer_predicates(sql)
+        result["sql_query"] = sql
+    return result
+
+
+def _attach_metadata(result: dict, response) -> dict:
+    result["_metadata"] = {
+        "model": "gpt-4o-mini",
+        "tokens_used": {
+            "prompt": response.usage.prompt_tokens,
+            "completion": response.usage.completion_tokens,
+            "total": response.usage.total_tokens
+        }
+    }
+    return result
+
+
+def generate_sql_queries(questions: list) -> list:
+    """Generate SQL for several questions in one LLM call.
+
+    A loop of single calls pays one HTTP round trip and one full prompt
+    (system + schema) per question; batching shares both, so N questions
+    cost roughly one call's latency. Responses come back as an array in
+    question order. The shared call's token usage is attached to every
+    result - the per-question split isn't knowable from one usage block.
+    """
+    response = _get_client().beta.chat.completions.parse(
         model="gpt-4o-mini",
         messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_message}
+            _SYSTEM_MESSAGE,
+            {"role": "user", "content": _build_batch_message(questions)}
         ],
-        response_format=SQL_RESPONSE_SCHEMA,
+        response_format=SQLQueryBatchResponse,
         temperature=0.1
     )
 
-    result = json.loads(response.choices[0].message.content)
+    parsed = response.choices[0].message.parsed.responses
+    if len(parsed) != len(questions):
+        raise ValueError(
+            f"Expected {len(questions)} responses, got {len(parsed)}"
+        )
+
+    return [
+        _attach_metadata(_optimize_generated_sql(item.model_dump()), response)
+        for item in parsed
+    ]
 
+
+def generate_sql_query(question: str) -> dict:
+    return generate_sql_queries([question])[0]
+
+
+# Matches the sql_query field while it is still being generated (no
+# closing quote required), so the UI can paint the SQL token by token.
+_SQL_FIELD_PARTIAL_RE = re.compile(r'"sql_query"\s*:\s*"((?:[^"\\]|\\.)*)')
+
+
+def generate_sql_query_stream(question: str):
+    """
+    Streaming variant of generate_sql_query for the Streamlit UI.
+
+    Yields ("sql", partial_sql) whenever the sql_query field grows, so the
+    query paints while the model is still generating, then ("final",
+    result) with the same dict the blocking call returns.
+    """
+    stream = _get_client().chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            _SYSTEM_MESSAGE,
+            {"role": "user", "content": _build_user_message(question)}
+        ],
+        response_format=SQL_RESPONSE_SCHEMA,
+        temperature=0.1,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+
+    content_parts = []
+    last_sql = None
+    usage = None
+
+    for chunk in stream:
+        if chunk.usage is not None:
+            usage = chunk.usage
+        if chunk.choices and chunk.choices[0].delta.content:
+            content_parts.append(chunk.choices[0].delta.content)
+            match = _SQL_FIELD_PARTIAL_RE.search("".join(content_parts))
+            if match and match.group(1) != last_sql:
+                last_sql = match.group(1)
+                yield "sql", last_sql.replace('\\n', '\n').replace('\\"', '"')
+
+    # orjson parses the accumulated reply in C - same dict out, several
+    # times faster than stdlib json on these few-KB payloads.
+    result = _optimize_generated_sql(orjson.loads("".join(content_parts)))
     result["_metadata"] = {
         "model": "gpt-4o-mini",
         "tokens_used": {
-            "prompt": response.usage.prompt_tokens,
-            "completion": response.usage.completion_tokens,
-            "total": response.usage.total_tokens
+            "prompt": usage.prompt_tokens if usage else 0,
+            "completion": usage.completion_tokens if usage else 0,
+            "total": usage.total_tokens if usage else 0
         }
     }
 
+    yield "final", result
+
+
+async def agenerate_sql_query(question: str) -> dict:
+    """Async variant of generate_sql_query, for running independent
+    questions concurrently so N questions cost ~1x round-trip wall time."""
+    response = await _get_async_client().beta.chat.completions.parse(
+        model="gpt-4o-mini",
+        messages=[
+            _SYSTEM_MESSAGE,
+            {"role": "user", "content": _build_user_message(question)}
+        ],
+        response_format=SQLQueryResponse,
+        temperature=0.1
+    )
+
+    result = _optimize_generated_sql(response.choices[0].message.parsed.model_dump())
+    return _attach_metadata(result, response)
+
+
+def _is_bad_plan(notes) -> bool:
+    return any(
+        note.startswith("Full table scan") or note.startswith("Multiple table scans")
+        for note in notes
+    )
+
+
+_RETRY_INSTRUCTION = (
+    "The previous SQL for this question produced this EXPLAIN QUERY PLAN:\n"
+    "{plan}\n"
+    "Rewrite the query to avoid full table scans - filter and join on "
+    "indexed columns where possible. Keep the result semantics identical."
+)
+
+
+@lru_cache(maxsize=256)
+def _retry_rewrite(question: str, sql: str, plan_text: str) -> str:
+    """One plan-guided retry call, memoized by (question, sql, plan) so
+    repeated asks of the same question against the same plan reuse the
+    rewrite instead of paying a second round trip each time. Returns ""
+    when the rewrite is unsafe, unchanged, or no better than the
+    original."""
+    response = _get_client().beta.chat.completions.parse(
+        model="gpt-4o-mini",
+        messages=[
+            _SYSTEM_MESSAGE,
+            {"role": "system", "content": _RETRY_INSTRUCTION.format(plan=plan_text)},
+            {"role": "user", "content": _build_user_message(question)}
+        ],
+        response_format=SQLQueryResponse,
+        temperature=0.1
+    )
+
+    candidate = response.choices[0].message.parsed.sql_query
+    if not candidate or candidate == sql:
+        return ""
+    is_safe, _ = validate_sql_safety(candidate)
+    if not is_safe:
+        return ""
+    plan, notes = get_explain_plan(candidate)
+    if not plan or _is_bad_plan(notes):
+        return ""
+    return candidate
+
+
+def apply_plan_guided_retry(question: str, result: dict) -> dict:
+    """One plan-guided retry on an already generated result.
+
+    When the analyzer flags the generated query (full table scan or
+    multiple scans), the EXPLAIN output goes back to the model once with
+    a rewrite instruction - the analyzer acts as the accept/reject
+    signal, and the bad query is never executed in the meantime. The
+    rewrite is kept only if its own plan comes back clean; otherwise the
+    original stands. Capped at one retry. Works on the dict any of the
+    generator entry points return, so the streaming UI path can use it
+    after the stream completes.
+    """
+    sql = result["sql_query"]
+    if result["is_blocked"] or not sql:
+        return result
+
+    plan, notes = get_explain_plan(sql)
+    if plan and _is_bad_plan(notes):
+        rewritten = _retry_rewrite(question, sql, "\n".join(str(row) for row in plan))
+        if rewritten:
+            result["sql_query"] = rewritten
+            result["_retry"] = {"original_sql": sql, "plan": [str(row) for row in plan]}
+
     return result
 
 
+def generate_sql_query_with_retry(question: str) -> dict:
+    """generate_sql_query plus the plan-guided retry above."""
+    return apply_plan_guided_retry(question, generate_sql_query(question))
+
+
+# One compiled alternation replaces the per-keyword re.search loop, and
+# comment stripping stops keywords hiding inside -- or /* */ blocks from
+# slipping past (or, conversely, tripping the filter from inside a
+# harmless comment).
+_UNSAFE_SQL_RE = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|DROP|ALTER|CREATE|TRUNCATE|EXEC(?:UTE)?|GRANT|REVOKE)\b",
+    re.IGNORECASE
+)
+_SQL_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STMT_START_RE = re.compile(r"\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
 def validate_sql_safety(sql: str) -> tuple[bool, str]:
     if not sql or not sql.strip():
         return True, ""
 
-    sql_upper = sql.upper().strip()
-
-    dangerous_keywords = [
-        "INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE",
-        "TRUNCATE", "EXEC", "EXECUTE", "GRANT", "REVOKE"
-    ]
+    stripped = _SQL_COMMENT_RE.sub(" ", sql).strip()
 
-    for keyword in dangerous_keywords:
-        if re.search(rf'\b{keyword}\b', sql_upper):
-            return False, f"Blocked: {keyword} statements are not allowed"
+    match = _UNSAFE_SQL_RE.search(stripped)
+    if match:
+        return False, f"Blocked: {match.group(1).upper()} statements are not allowed"
 
-    if not (sql_upper.startswith("SELECT") or sql_upper.startswith("WITH")):
+    if not _STMT_START_RE.match(stripped):
         return False, "Query must be a SELECT statement"
 
     return True, ""
 
 
-def check_competitor_mention(question: str) -> tuple[bool, str]:
-    competitors = [
-        "mcdonald", "mcdonalds", "kfc", "spur", "nando", "nandos",
-        "wimpy", "steers", "burger king", "ocean basket", "pizza hut",
-        "dominos", "debonairs", "roman's pizza", "fishaways",
-        "vida", "mugg & bean", "seattle coffee"
-    ]
+COMPETITORS = [
+    "mcdonald", "mcdonalds", "kfc", "spur", "nando", "nandos",
+    "wimpy", "steers", "burger king", "ocean basket", "pizza hut",
+    "dominos", "debonairs", "roman's pizza", "fishaways",
+    "vida", "mugg & bean", "seattle coffee"
+]
 
-    question_lower = question.lower()
+# One compiled alternation (longest-first so "mcdonalds" wins over
+# "mcdonald") scans the question in a single pass instead of ~18 separate
+# substring searches, and the word boundaries stop brands firing inside
+# unrelated words ("spur" in "spurious").
+_COMPETITOR_RE = re.compile(
+    r"\b(" + "|".join(
+        re.escape(brand) for brand in sorted(COMPETITORS, key=len, reverse=True)
+    ) + r")\b",
+    re.IGNORECASE
+)
 
-    for competitor in competitors:
-        if competitor in question_lower:
-            return True, competitor.title()
 
+@lru_cache(maxsize=1024)
+def check_competitor_mention(question: str) -> tuple[bool, str]:
+    match = _COMPETITOR_RE.search(question)
+    if match:
+        return True, match.group(1).title()
     return False, ""
 
 
@@ -279,17 +607,28 @@ if __name__ == "__main__":
     print("TEXT-TO-SQL QUERY GENERATOR TEST")
     print("=" * 50)
 
+    # Pre-filter competitor questions locally, then send the survivors
+    # to the model as one batched call instead of one call each.
+    blocked = {}
+    to_generate = []
+    for question in test_questions:
+        has_competitor, competitor = check_competitor_mention(question)
+        if has_competitor:
+            blocked[question] = competitor
+        else:
+            to_generate.append(question)
+
+    try:
+        results = dict(zip(to_generate, generate_sql_queries(to_generate)))
+    except Exception as e:
+        print(f"Error: {e}")
+        results = {}
+
     for question in test_questions:
         print(f"\nQuestion: {question}")
         print("-" * 40)
 
-        has_competitor, competitor = check_competitor_mention(question)
-        if has_competitor:
-            print(f"BLOCKED: Cannot process queries about competitor brands ({competitor})")
-            continue
-
-        try:
-            result = generate_sql_query(question)
-            print(format_query_result(result))
-        except Exception as e:
-            print(f"Error: {e}")
+        if question in blocked:
+            print(f"BLOCKED: Cannot process queries about competitor brands ({blocked[question]})")
+        elif question in results:
+            print(format_query_result(results[question]))